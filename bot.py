@@ -1,10 +1,13 @@
 import telebot
 from telebot import types
-from config import BOT_TOKEN
+from config import (BOT_TOKEN, ADMIN_IDS, PROFILE_INTERVAL_MS, PROFILE_DURATION, PROFILE_MAX_DURATION,
+                    PROFILE_DIR)
 from database import Database
 from enum import Enum
 from utils import safe_send
+from profiler import SamplingProfiler, HandlerTagger, profile_duration, parse_profile_command
 import logging
+import os
 
 # Подавляем ложные "ошибки" от telebot при остановке
 logging.getLogger('telebot').setLevel(logging.WARNING)
@@ -52,7 +55,47 @@ def category_keyboard():
     return markup
 
 
+# Профилирование: тег сэмпла = активный обработчик + состояние пользователя на входе в него
+handler_tagger = HandlerTagger(user_states, lambda: profiler.running)
+profiler = SamplingProfiler(handler_tagger, output_dir=PROFILE_DIR, interval=PROFILE_INTERVAL_MS / 1000)
+
+
 # Команды
+@bot.message_handler(commands=['profile'], func=lambda m: m.chat.id in ADMIN_IDS)
+def start_profiling(message):
+    duration = parse_profile_command(message.text, PROFILE_DURATION, PROFILE_MAX_DURATION)
+    if duration is None:
+        if profiler.stop():
+            send_safe_message(bot, message.chat.id, "⏹ Профилирование остановлено, профиль записывается...")
+        else:
+            send_safe_message(bot, message.chat.id, "ℹ️ Профилирование не запущено")
+        return
+
+    def notify(path, total):
+        failed = f"❌ Не удалось записать профиль ({total} сэмплов), см. лог"
+        if path is None:
+            send_safe_message(bot, message.chat.id, failed)
+            return
+        try:
+            # Байты, а не открытый файл: при повторной попытке отправки файл читался бы с конца
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            logging.exception(f"Не удалось прочитать профиль {path}")
+            send_safe_message(bot, message.chat.id, failed)
+            return
+        sent = send_safe_document(bot, message.chat.id, data, visible_file_name=os.path.basename(path),
+                                  caption=f"📊 Профиль готов: {total} сэмплов")
+        if sent is None:  # все попытки отправки исчерпаны
+            send_safe_message(bot, message.chat.id,
+                              f"❌ Не удалось отправить профиль ({total} сэмплов), он сохранён на сервере")
+
+    if not profiler.start(duration, on_finish=notify):
+        send_safe_message(bot, message.chat.id, "⏳ Профилирование уже идёт (/profile stop — остановить)")
+        return
+    send_safe_message(bot, message.chat.id, f"📊 Профилирование запущено на {duration} сек.")
+
+
 @bot.message_handler(commands=['start'])
 def start(message):
     user_id = message.chat.id
@@ -429,6 +472,12 @@ def send_safe_message(bot, chat_id, text, **kwargs):
 # bot.send_message(...)
 # Используем: send_safe_message(bot, message.chat.id, "✅ Рецепт сохранён!", reply_markup=main_menu())
 
+
+@safe_send
+def send_safe_document(bot, chat_id, document, **kwargs):
+    return bot.send_document(chat_id, document, **kwargs)
+
+
 def require_consent(handler):
     """Декоратор: блокирует действия без согласия"""
     def wrapper(message):
@@ -440,10 +489,14 @@ def require_consent(handler):
         return handler(message)
     return wrapper
 
+# Обёртки для профилирования — после регистрации всех обработчиков
+handler_tagger.track(bot.message_handlers + bot.callback_query_handlers)
+
 # Запуск и остановка
 if __name__ == "__main__":
     import sys
     import time
+    import signal
     from urllib3.exceptions import ProtocolError
 
     # Настройка логгирования (после подавления уровней)
@@ -456,6 +509,11 @@ if __name__ == "__main__":
         ]
     )
 
+    # SIGUSR1 запускает профилирование без перезапуска бота (только Unix)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.start(
+            profile_duration(PROFILE_DURATION, PROFILE_MAX_DURATION)))
+
     print("🤖 Бот «Блокнот рецептов» запускается...")
     print("Нажмите Ctrl+C для остановки")
 
@@ -8,4 +8,12 @@ load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
 if not BOT_TOKEN:
-    raise ValueError("❌ BOT_TOKEN не найден! Проверьте файл .env")
\ No newline at end of file
+    raise ValueError("❌ BOT_TOKEN не найден! Проверьте файл .env")
+
+# Профилирование обработчиков (/profile для администраторов или сигнал SIGUSR1)
+ADMIN_IDS = {int(i) for i in os.getenv("ADMIN_IDS", "").split(",") if i.strip()}
+# Нулевой интервал занял бы GIL у измеряемых потоков, поэтому не меньше 1 мс и 1 сек
+PROFILE_INTERVAL_MS = max(1, int(os.getenv("PROFILE_INTERVAL_MS", "10")))
+PROFILE_DURATION = max(1, int(os.getenv("PROFILE_DURATION", "30")))
+PROFILE_MAX_DURATION = max(1, int(os.getenv("PROFILE_MAX_DURATION", "300")))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
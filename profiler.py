@@ -0,0 +1,182 @@
+# profiler.py
+import os
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """Сэмплирующий профайлер: снимает стеки потоков и пишет collapsed-файлы для flamegraph.
+
+    Пока профайлер выключен, фонового потока нет. Обработчики бота оборачиваются
+    один раз при импорте (HandlerTagger.track): без профилирования это одна
+    проверка running на каждое обновление, а состояние в dispatch_states
+    записывается только во время сбора. Тег для каждого стека вычисляет
+    tagger(thread_id, frame): если он вернул None, сэмпл отбрасывается
+    (например, простаивающий поток).
+    """
+
+    def __init__(self, tagger, output_dir="profiles", interval=0.01):
+        self.tagger = tagger
+        self.output_dir = output_dir
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration, on_finish=None):
+        """Запускает сбор сэмплов на duration секунд. Возвращает False, если уже запущен.
+
+        По окончании вызывается on_finish(path, total); path равен None, если файл записать не удалось.
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(duration, on_finish),
+                name="SamplingProfiler",
+                daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Досрочно завершает сбор — уже собранные сэмплы будут записаны. Возвращает False, если не запущен."""
+        if not self.running:
+            return False
+        self._stop.set()
+        return True
+
+    def _run(self, duration, on_finish):
+        own_id = threading.get_ident()
+        stacks = Counter()
+        deadline = time.monotonic() + duration
+
+        while time.monotonic() < deadline and not self._stop.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                try:
+                    tag = self.tagger(thread_id, frame)
+                except Exception as e:
+                    logger.debug(f"Ошибка тегирования сэмпла: {e}")
+                    continue
+                if tag is not None:
+                    stacks[self._collapse(tag, frame)] += 1
+            self._stop.wait(self.interval)
+
+        total = sum(stacks.values())
+        try:
+            path = self._write(stacks)
+            logger.info(f"Профилирование завершено: {total} сэмплов записано в {path}")
+        except OSError:
+            path = None
+            logger.exception(f"Не удалось записать профиль ({total} сэмплов)")
+        if on_finish:
+            try:
+                on_finish(path, total)
+            except Exception:
+                logger.exception("Ошибка при обработке готового профиля")
+
+    @staticmethod
+    def _collapse(tag, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+            frame = frame.f_back
+        names.append(tag)
+        # collapsed-формат: корень слева, кадры через «;»
+        return ";".join(name.replace(";", ",") for name in reversed(names))
+
+    def _write(self, stacks):
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = datetime.now().strftime("profile_%Y%m%d_%H%M%S_%f")[:-3]  # миллисекунды
+        path = os.path.join(self.output_dir, f"{name}.folded")
+        suffix = 0
+        while True:
+            try:
+                # "x": не перезаписываем прошлый профиль, а берём следующее имя
+                f = open(path, "x", encoding="utf-8")
+                break
+            except FileExistsError:
+                suffix += 1
+                path = os.path.join(self.output_dir, f"{name}_{suffix}.folded")
+        with f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+class HandlerTagger:
+    """Тег сэмпла = активный обработчик + состояние пользователя на входе в него.
+
+    track() оборачивает обработчики telebot после их регистрации; is_running()
+    сообщает, идёт ли сейчас профилирование.
+    """
+
+    def __init__(self, user_states, is_running):
+        self.user_states = user_states
+        self.is_running = is_running
+        self.handler_codes = set()
+        self.dispatch_states = {}  # thread_id -> State на момент вызова обработчика
+
+    def __call__(self, thread_id, frame):
+        while frame is not None:
+            if frame.f_code in self.handler_codes:
+                if thread_id in self.dispatch_states:
+                    state = self.dispatch_states[thread_id]
+                    state_name = state.name if state else 'NO_STATE'
+                else:
+                    state_name = 'UNKNOWN'  # обработчик начался до запуска профилирования
+                return f"{frame.f_code.co_name} [{state_name}]"
+            frame = frame.f_back
+        return None  # поток не выполняет обработчик — сэмпл не нужен
+
+    def wrap(self, handler):
+        """Запоминает состояние пользователя при входе в обработчик, пока идёт профилирование"""
+        self.handler_codes.add(handler.__code__)
+
+        @wraps(handler)
+        def wrapper(update, *args, **kwargs):
+            if not self.is_running():
+                return handler(update, *args, **kwargs)
+            thread_id = threading.get_ident()
+            # message.chat для сообщений, call.message.chat для callback-запросов
+            chat = update.chat if hasattr(update, 'chat') else update.message.chat
+            self.dispatch_states[thread_id] = self.user_states.get(chat.id)
+            try:
+                return handler(update, *args, **kwargs)
+            finally:
+                self.dispatch_states.pop(thread_id, None)
+        return wrapper
+
+    def track(self, handlers):
+        """Оборачивает список обработчиков telebot (словари с ключом 'function')"""
+        for h in handlers:
+            h['function'] = self.wrap(h['function'])
+
+
+def profile_duration(seconds, max_duration):
+    return max(1, min(seconds, max_duration))
+
+
+def parse_profile_command(text, default_duration, max_duration):
+    """Разбирает «/profile [секунды|stop]»: None для stop, иначе длительность в секундах"""
+    args = text.split()
+    if len(args) > 1 and args[1] == "stop":
+        return None
+    seconds = int(args[1]) if len(args) > 1 and args[1].isdigit() else default_duration
+    return profile_duration(seconds, max_duration)
@@ -0,0 +1,221 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from enum import Enum
+from types import SimpleNamespace
+
+import profiler as profiler_module
+from profiler import SamplingProfiler, HandlerTagger, profile_duration, parse_profile_command
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def busy_tag(thread_id, frame):
+    while frame is not None:
+        if frame.f_code is busy.__code__:
+            return "busy [TEST]"
+        frame = frame.f_back
+    return None
+
+
+def run_profile(profiler, duration):
+    done = threading.Event()
+    result = {}
+
+    def on_finish(path, total):
+        result.update(path=path, total=total)
+        done.set()
+
+    assert profiler.start(duration, on_finish=on_finish)
+    assert done.wait(10)
+    return result
+
+
+def test_collapse_root_first_and_escapes_semicolons():
+    def inner():
+        return SamplingProfiler._collapse("tag;x", sys._getframe())
+
+    stack = inner().split(";")
+    assert stack[0] == "tag,x"
+    assert stack[-1] == "inner (test_profiler.py)"
+    assert stack[-2] == "test_collapse_root_first_and_escapes_semicolons (test_profiler.py)"
+
+
+def test_busy_thread_is_sampled_and_written(tmp_path):
+    stop = threading.Event()
+    worker = threading.Thread(target=busy, args=(stop,))
+    worker.start()
+    try:
+        profiler = SamplingProfiler(busy_tag, output_dir=str(tmp_path), interval=0.005)
+        result = run_profile(profiler, 0.3)
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = open(result["path"], encoding="utf-8").read().splitlines()
+    assert lines
+    assert all(line.startswith("busy [TEST];") for line in lines)
+    assert all(";busy (test_profiler.py)" in line for line in lines)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == result["total"] > 0
+
+
+def test_untagged_threads_are_skipped(tmp_path):
+    profiler = SamplingProfiler(lambda thread_id, frame: None, output_dir=str(tmp_path), interval=0.005)
+    result = run_profile(profiler, 0.05)
+    assert result["total"] == 0
+    assert open(result["path"], encoding="utf-8").read() == ""
+
+
+def test_double_start_and_stop(tmp_path):
+    profiler = SamplingProfiler(busy_tag, output_dir=str(tmp_path), interval=0.005)
+    assert not profiler.stop()
+
+    done = threading.Event()
+    assert profiler.start(60, on_finish=lambda path, total: done.set())
+    assert not profiler.start(60)
+    assert profiler.stop()
+    assert done.wait(5)
+    time.sleep(0.05)
+    assert not profiler.running
+    assert profiler.start(0.01)
+
+
+def test_runs_do_not_overwrite_each_other(tmp_path):
+    profiler = SamplingProfiler(busy_tag, output_dir=str(tmp_path), interval=0.001)
+    paths = {run_profile(profiler, 0.001)["path"] for _ in range(3)}
+    assert len(paths) == 3
+    assert len(list(tmp_path.iterdir())) == 3
+
+
+def test_write_failure_reports_none_path(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    profiler = SamplingProfiler(busy_tag, output_dir=str(blocker / "profiles"), interval=0.005)
+    assert run_profile(profiler, 0.01)["path"] is None
+
+
+class State(Enum):
+    AWAITING_SEARCH_QUERY = 7
+
+
+def make_tagger(user_states, running=True):
+    return HandlerTagger(user_states, lambda: running)
+
+
+def message(chat_id):
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id))
+
+
+def callback_query(chat_id):
+    return SimpleNamespace(message=message(chat_id))
+
+
+def test_tag_uses_state_at_handler_entry():
+    user_states = {1: State.AWAITING_SEARCH_QUERY}
+    tagger = make_tagger(user_states)
+    tags = []
+
+    def perform_search(msg):
+        del user_states[msg.chat.id]  # обработчик сбрасывает состояние до конца своей работы
+        tags.append(tagger(threading.get_ident(), sys._getframe()))
+
+    handlers = [{'function': perform_search}]
+    tagger.track(handlers)
+    handlers[0]['function'](message(1))
+
+    assert tags == ["perform_search [AWAITING_SEARCH_QUERY]"]
+    assert tagger.dispatch_states == {}
+
+
+def test_tag_no_state_and_callback_query_chat():
+    tagger = make_tagger({})
+    tags = []
+
+    def callback_handler(call):
+        tags.append(tagger(threading.get_ident(), sys._getframe()))
+
+    tagger.wrap(callback_handler)(callback_query(2))
+    assert tags == ["callback_handler [NO_STATE]"]
+
+
+def test_tag_unknown_when_handler_started_before_run():
+    tagger = make_tagger({1: State.AWAITING_SEARCH_QUERY}, running=False)
+    tags = []
+
+    def perform_search(msg):
+        tags.append(tagger(threading.get_ident(), sys._getframe()))
+
+    tagger.wrap(perform_search)(message(1))
+    assert tags == ["perform_search [UNKNOWN]"]
+    assert tagger.dispatch_states == {}
+
+
+def test_tag_skips_threads_outside_handlers():
+    tagger = make_tagger({})
+    assert tagger(threading.get_ident(), sys._getframe()) is None
+
+
+def test_sampled_handler_is_tagged_with_entry_state(tmp_path):
+    user_states = {1: State.AWAITING_SEARCH_QUERY}
+    tagger = HandlerTagger(user_states, lambda: profiler.running)
+    profiler = SamplingProfiler(tagger, output_dir=str(tmp_path), interval=0.005)
+    stop = threading.Event()
+
+    def perform_search(msg):
+        user_states.pop(msg.chat.id)
+        busy(stop)
+
+    handler = tagger.wrap(perform_search)
+    done = threading.Event()
+    result = {}
+    assert profiler.start(60, on_finish=lambda path, total: (result.update(path=path), done.set()))
+    worker = threading.Thread(target=handler, args=(message(1),))
+    worker.start()
+    time.sleep(0.2)
+    profiler.stop()
+    assert done.wait(5)
+    stop.set()
+    worker.join()
+
+    lines = open(result["path"], encoding="utf-8").read().splitlines()
+    assert lines
+    assert all(line.startswith("perform_search [AWAITING_SEARCH_QUERY];") for line in lines)
+
+
+def test_profile_duration_is_clamped():
+    assert profile_duration(0, 300) == 1
+    assert profile_duration(30, 300) == 30
+    assert profile_duration(999999, 300) == 300
+
+
+def test_parse_profile_command():
+    assert parse_profile_command("/profile", 30, 300) == 30
+    assert parse_profile_command("/profile 10", 30, 300) == 10
+    assert parse_profile_command("/profile 0", 30, 300) == 1
+    assert parse_profile_command("/profile 999999", 30, 300) == 300
+    assert parse_profile_command("/profile abc", 30, 300) == 30
+    assert parse_profile_command("/profile stop", 30, 300) is None
+
+
+def test_name_collision_gets_suffix(tmp_path, monkeypatch):
+    class FrozenDatetime:
+        @staticmethod
+        def now():
+            return datetime(2026, 1, 1, 12, 0, 0, 123000)
+
+    monkeypatch.setattr(profiler_module, "datetime", FrozenDatetime)
+    profiler = SamplingProfiler(busy_tag, output_dir=str(tmp_path))
+    paths = [profiler._write(Counter({"a;b": i + 1})) for i in range(3)]
+
+    assert [os.path.basename(p) for p in paths] == [
+        "profile_20260101_120000_123.folded",
+        "profile_20260101_120000_123_1.folded",
+        "profile_20260101_120000_123_2.folded",
+    ]
+    assert [open(p, encoding="utf-8").read() for p in paths] == ["a;b 1\n", "a;b 2\n", "a;b 3\n"]